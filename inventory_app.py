@@ -12,122 +12,22 @@ Major change
 
 from __future__ import annotations
 import datetime
-import json
-import os
-import smtplib
-from email.message import EmailMessage
-from pathlib import Path
-from typing import Dict, Any, Tuple, List
+import sys
+from typing import Dict, List
 
 import streamlit as st
 
-# ─────────────────────────────────────────────────────────────
-# 0.  Configuration  ░ SMTP + producer profiles
-# ─────────────────────────────────────────────────────────────
-SECRETS = st.secrets.get("smtp", {})
-SMTP_HOST = SECRETS.get("host") or os.getenv("SMTP_HOST", "smtp.gmail.com")
-SMTP_PORT = int(SECRETS.get("port") or os.getenv("SMTP_PORT", 465))
-SMTP_USER = SECRETS.get("user") or os.getenv("SMTP_USER")
-SMTP_PASS = SECRETS.get("pass") or os.getenv("SMTP_PASS")
+from inventory_core import (
+    PRODUCERS, SMTP_PASS, SMTP_USER, Key, inventory_frame, load_template, save_template, send_email_async,
+)
 
-if not (SMTP_USER and SMTP_PASS):
+# once per session: the warning stays up until the first interaction
+if not (SMTP_USER and SMTP_PASS) and not st.session_state.get("warned_creds"):
+    st.session_state.warned_creds = True
     st.warning("⚠️  Configure SMTP credentials in Secrets or env vars to enable e‑mail.")
 
-now = datetime.date.today()
-form_now = now.strftime("%m.%d.%y")
-PRODUCERS: Dict[str, Dict[str, Any]] = {
-    "Why Not Pie": {
-        "categories": ["Cafe", "Market", "Goodies", "Frozen"],
-        "default_subject": "WNP Inventory " + form_now,
-        "default_recipient": "",
-        "mainstays": [
-            {"name": "PBJ Muffins", "tag": "Cafe"},
-            {"name": "Biscotti", "tag": "Cafe"},
-            {"name": "Biscotti", "tag": "Frozen"},
-            {"name": "Salami n Cheese Sando", "tag": "Market"},
-        ],
-    },
-    "Arbor Teas": {
-        "categories": ["Market", "Cafe", "Freezer"],
-        "default_subject": "Arbor Teas Inventory " + form_now,
-        "default_recipient": "",
-       "mainstays": []
-    },
-}
-
-TEMPLATE_DIR = Path.cwd() / "templates"
-TEMPLATE_DIR.mkdir(exist_ok=True)
-
-# ─────────────────────────────────────────────────────────────
-# 1.  Helpers
-# ─────────────────────────────────────────────────────────────
-SEP = "~~~"
-make_key = lambda n, t: f"{n.strip()}{SEP}{t}"
-split_key = lambda k: k.rsplit(SEP, 1)
-slugify = lambda s: "_".join(s.lower().split())
-
-def template_path(profile: str) -> Path:
-    return TEMPLATE_DIR / f"{slugify(profile)}.json"
-
-def load_template(profile: str) -> List[Dict[str, str]]:
-    p = template_path(profile)
-    if p.exists():
-        try:
-            data = json.loads(p.read_text())
-            return [d for d in data if isinstance(d, dict) and d.get("name")]
-        except Exception as exc:
-            st.error(f"⚠️ Could not parse {p}: {exc}")
-    return PRODUCERS.get(profile, {}).get("mainstays", [])
-
-def save_template(profile: str, items: List[Dict[str, str]]):
-    try:
-        template_path(profile).write_text(json.dumps(items, indent=2))
-    except Exception as exc:
-        st.error(f"Template save failed: {exc}")
-
-_nl2br = lambda s: s.replace("\n", "<br>") if s else ""
-
-# ─────────────────────────────────────────────────────────────
-# 2.  E‑mail (unchanged from v4.4)
-# ─────────────────────────────────────────────────────────────
-
-def send_email(*, recipient: str, inventory: Dict[str, Dict[str, Any]], categories: List[str], subject: str, before_txt: str, after_txt: str) -> None:
-    inventory = {k: v for k, v in inventory.items() if v["qty"] > 0}
-    grouped: Dict[str, List[Tuple[str, int]]] = {cat: [] for cat in categories}
-    for k, v in inventory.items():
-        name, tag = split_key(k)
-        grouped.setdefault(tag, []).append((name, v["qty"]))
-
-    rows_plain: List[str] = []
-    for cat in categories + [c for c in grouped if c not in categories]:
-        if not grouped[cat]:
-            continue
-        rows_plain.extend([f"=== {cat} ===", "Item\tQuantity"])
-        rows_plain.extend([f"{n}\t{q}" for n, q in sorted(grouped[cat])])
-        rows_plain.append("")
-    table_plain = "\n".join(rows_plain).strip()
-
-    rows_html: List[str] = []
-    for cat in categories + [c for c in grouped if c not in categories]:
-        if not grouped[cat]:
-            continue
-        rows_html.append(f"<tr style='background:#f3f3f3;font-weight:bold;'><td colspan='2' style='padding:6px 12px'>{cat}</td></tr>")
-        for n, q in sorted(grouped[cat]):
-            rows_html.append(f"<tr><td style='padding:4px 12px'>{n}</td><td align='right'>{q}</td></tr>")
-    table_html = (
-        "<table border='1' cellspacing='0' cellpadding='4' style='border-collapse:collapse;font-family:sans-serif;'>"
-        "<tr><th style='padding:4px 12px'>Item</th><th>Qty</th></tr>" + "".join(rows_html) + "</table>"
-    )
-
-    msg = EmailMessage()
-    msg["Subject"], msg["From"], msg["To"] = subject, SMTP_USER, recipient
-    msg.set_content("\n\n".join(filter(None, [before_txt.strip(), table_plain, after_txt.strip()])))
-    msg.add_alternative(f"<html><body>{_nl2br(before_txt)}{table_html}{_nl2br(after_txt)}</body></html>", subtype="html")
-    with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as smtp:
-        smtp.login(SMTP_USER, SMTP_PASS); smtp.send_message(msg)
-
 # ─────────────────────────────────────────────────────────────
-# 3.  Streamlit UI
+# Streamlit UI  (config, templates and e‑mail live in inventory_core.py)
 # ─────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="Inventory Counter",
@@ -144,7 +44,9 @@ with logo_col:
 profile_names = list(PRODUCERS)
 profile = st.selectbox("Producer profile", profile_names, index=profile_names.index(st.session_state.get("profile", profile_names[0])))
 st.session_state.profile = profile
-CFG, CATEGORIES = PRODUCERS[profile], PRODUCERS[profile]["categories"]
+CFG = PRODUCERS[profile]
+# interned, so tag lookups against the category list compare by identity first
+CATEGORIES = [sys.intern(c) for c in CFG.categories]
 
 with title_col:
     st.title(f"Inventory Counter – {profile}")
@@ -157,19 +59,46 @@ with title_col:
 
 
 
+# Quantity writes go through these helpers so `nonzero_count` (items with qty > 0)
+# stays in step and the Send button never has to scan the inventory, and so
+# `inventory_rev` moves whenever the sorted table view needs rebuilding.
+
+def _put_qty(inv: Dict[Key, int], key: Key, old: int, qty: int):
+    inv[key] = qty
+    st.session_state.nonzero_count += (qty > 0) - (old > 0)
+    st.session_state.inventory_rev += 1
+
+def set_qty(key: Key, qty: int):
+    inv = st.session_state.inventory
+    _put_qty(inv, key, inv.get(key, 0), qty)
+
+def add_qty(key: Key, qty: int):
+    # one lookup serves both the merge and the nonzero bookkeeping
+    inv = st.session_state.inventory
+    old = inv.get(key, 0)
+    _put_qty(inv, key, old, old + qty)
+
+def drop_item(key: Key):
+    if st.session_state.inventory.pop(key, 0) > 0:
+        st.session_state.nonzero_count -= 1
+    st.session_state.inventory_rev += 1
+
+def reset_inventory(items: List[Dict[str, str]]):
+    st.session_state.inventory = {(itm["name"].strip(), sys.intern(itm.get("tag", CATEGORIES[0]))): 0 for itm in items}
+    st.session_state.nonzero_count = 0
+    st.session_state.inventory_rev = st.session_state.get("inventory_rev", 0) + 1
+
 # Load template into session_state.inventory
 if "inventory" not in st.session_state or st.session_state.get("inventory_profile") != profile:
-    st.session_state.inventory = {make_key(itm["name"], itm.get("tag", CATEGORIES[0])): {"qty": 0} for itm in load_template(profile)}
+    reset_inventory(load_template(profile))
     st.session_state.inventory_profile = profile
-    st.rerun()
 
 # Template buttons
 col_reset, col_save = st.columns([1, 1])
-if col_reset.button("Reset to template items", type="secondary"):
-    st.session_state.inventory = {make_key(itm["name"], itm.get("tag", CATEGORIES[0])): {"qty": 0} for itm in load_template(profile)}
+col_reset.button("Reset to template items", type="secondary", on_click=lambda: reset_inventory(load_template(profile)))
 if col_save.button("Save current list as template", type="primary"):
-    save_template(profile, [{"name": split_key(k)[0], "tag": split_key(k)[1]} for k in st.session_state.inventory])
-    st.success("Template saved!")
+    if save_template(profile, [{"name": name, "tag": tag} for name, tag in st.session_state.inventory]):
+        st.success("Template saved!")
 
 st.divider()
 
@@ -177,9 +106,9 @@ st.divider()
 
 def add_item_cb():
     name, qty = st.session_state.get("new_item", "").strip(), int(st.session_state.get("new_qty", 0))
-    tag = st.session_state.get("new_tag", CATEGORIES[0])
+    tag = sys.intern(st.session_state.get("new_tag", CATEGORIES[0]))
     if name:
-        st.session_state.inventory.setdefault(make_key(name, tag), {"qty": 0})["qty"] += qty
+        add_qty((name, tag), qty)
     st.session_state["new_item"], st.session_state["new_qty"] = "", 0
 
 c1, c2, c3, c4 = st.columns([3, 1, 3, 1])
@@ -191,49 +120,116 @@ with c4: st.button("Add", on_click=add_item_cb, use_container_width=True)
 st.divider()
 
 # Grouped inventory table
-if st.session_state.inventory:
-    st.subheader("Current Inventory")
-    for cat in CATEGORIES:
-        cat_keys = [k for k in st.session_state.inventory if split_key(k)[1] == cat]
-        if not cat_keys:
+
+def apply_edits_cb(editor_key: str, keys: List[Key], cat: str):
+    """Fold one category editor's deleted, edited and added rows back into the inventory."""
+    inv, changes = st.session_state.inventory, st.session_state[editor_key]
+    for i in changes["deleted_rows"]:
+        drop_item(keys[i])
+    for i, edit in changes["edited_rows"].items():
+        key = keys[int(i)]
+        if key not in inv:
             continue
-        st.markdown(f"### {cat}")
-        for key in sorted(cat_keys, key=lambda k: split_key(k)[0].lower()):
-            name, tag = split_key(key);
-            qty = st.session_state.inventory[key]["qty"]
-            (sp, d, nm, qt, tg) = st.columns([1, 1, 4, 2, 3])
-
-            if d.button("🗑️", key=f"del_{key}"): st.session_state.inventory.pop(key); st.rerun()
-            nm.write(name)
-            new_q = qt.number_input(" ", value=qty, min_value=0, step=1, key=f"num_{key}", label_visibility="collapsed")
-            if new_q != qty:
-                st.session_state.inventory[key]["qty"] = int(new_q)
-                st.rerun()
-
-            new_tag = tg.selectbox(" ", options=CATEGORIES, index=CATEGORIES.index(tag), key=f"tag_{key}", label_visibility="collapsed")
-            if new_tag != tag:
-                new_key = make_key(name, new_tag)
-                st.session_state.inventory.setdefault(new_key, {"qty": 0})["qty"] += st.session_state.inventory[key]["qty"]
-                st.session_state.inventory.pop(key);
-                st.rerun()
-    st.divider()
-    if st.button("Clear list 🗑️", type="secondary"): st.session_state.inventory.clear()
-else:
-    st.info("Add some items to get started.")
+        old_name, old_tag = key
+        name = (edit.get("name") or "").strip() or old_name  # no empty names, as in add_item_cb
+        tag = sys.intern(edit.get("tag") or old_tag)
+        qty = int(edit.get("qty", inv[key]) or 0)
+        new_key = (name, tag)
+        if new_key == key:
+            set_qty(key, qty)
+        else:  # renamed or re‑tagged: merge into the matching entry, if any
+            drop_item(key)
+            add_qty(new_key, qty)
+    for row in changes["added_rows"]:
+        name = (row.get("name") or "").strip()
+        if name:
+            add_qty((name, sys.intern(row.get("tag") or cat)), int(row.get("qty") or 0))
+    # fresh editor keys so the applied edits are not replayed on top of the new data
+    st.session_state.editor_rev += 1
+
+# Edits inside the table rerun only this fragment, not the template, add‑item and
+# e‑mail sections around it.
+@st.fragment
+def inventory_section():
+    # read once: every st.session_state access goes through the session proxy
+    inv, inv_rev = st.session_state.inventory, st.session_state.inventory_rev
+    if inv:
+        st.subheader("Current Inventory")
+        # one editor per category instead of a row of widgets per item
+        columns = {
+            "name": st.column_config.TextColumn("Item", required=True),
+            "qty": st.column_config.NumberColumn("Qty", min_value=0, step=1, format="%d", default=0),
+            "tag": st.column_config.SelectboxColumn("Tag", options=CATEGORIES, required=True),
+        }
+        # sort and group the columnar view only when the inventory changed, not on
+        # every keystroke elsewhere on the page
+        built_rev, by_cat = st.session_state.get("by_cat", (None, None))
+        if built_rev != inv_rev:
+            by_cat = {}
+            for cat, rows in inventory_frame(inv).groupby("tag", sort=False):
+                rows = rows.reset_index(drop=True)[list(columns)]
+                by_cat[cat] = rows, list(zip(rows["name"], rows["tag"]))
+            st.session_state.by_cat = (inv_rev, by_cat)
+        rev = st.session_state.setdefault("editor_rev", 0)
+        for cat in CATEGORIES:
+            if cat not in by_cat:
+                continue
+            rows, keys = by_cat[cat]
+            st.markdown(f"### {cat}")
+            editor_key = f"editor_{cat}_{rev}"
+            st.data_editor(
+                rows,
+                key=editor_key, column_config=columns, num_rows="dynamic", hide_index=True,
+                on_change=apply_edits_cb, args=(editor_key, keys, cat),
+            )
+        st.divider()
+        st.button("Clear list 🗑️", type="secondary", on_click=reset_inventory, args=([],))
+    else:
+        st.info("Add some items to get started.")
+    # the Send button lives outside the fragment; rerun the whole app when an
+    # edit flips whether there is anything to send
+    if (st.session_state.nonzero_count > 0) != has_stock:
+        st.rerun()
+
+has_stock = st.session_state.nonzero_count > 0
+inventory_section()
 
 st.divider()
 
 # Email config & send
-subject = st.text_input("E‑mail subject", value=CFG.get("default_subject", "Inventory Report"))
+default_subject = CFG.default_subject.format(date=datetime.date.today().strftime("%m.%d.%y"))
+subject = st.text_input("E‑mail subject", value=default_subject).strip()
 msg_before = st.text_area("Text before table (optional)")
 msg_after = st.text_area("Text after table (optional)")
-recipient = st.text_input("Recipient e‑mail", value=CFG.get("default_recipient", ""))
+recipient = st.text_input("Recipient e‑mail", value=CFG.default_recipient, help="Separate several addresses with commas.").strip()
 
-ready = bool(recipient.strip()) and any(v["qty"] > 0 for v in st.session_state.inventory.values())
-if st.button("Send Inventory Report ✉️", disabled=not ready):
+# The SMTP round‑trip runs on a background thread; the script only keeps the Future.
+pending = st.session_state.get("send_future")
+ready = bool(recipient) and st.session_state.nonzero_count > 0
+if st.button("Send Inventory Report ✉️", disabled=not ready or pending is not None):
     try:
-        send_email(recipient=recipient.strip(), inventory=st.session_state.inventory, categories=CATEGORIES, subject=subject.strip(), before_txt=msg_before, after_txt=msg_after)
+        st.session_state.send_future = send_email_async(recipient=recipient, inventory=st.session_state.inventory, categories=CATEGORIES, subject=subject, before_txt=msg_before, after_txt=msg_after)
     except Exception as exc:
         st.error(f"Failed to send: {exc}")
     else:
-        st.success("Report sent!")
\ No newline at end of file
+        st.rerun()  # redraw with the button disabled and the status fragment polling
+
+@st.fragment(run_every=0.5 if pending is not None else None)
+def send_status():
+    future = st.session_state.get("send_future")
+    if future is None:
+        return
+    if not future.done():
+        st.info("Sending report…")
+        return
+    st.session_state.send_result = future.exception()
+    del st.session_state.send_future
+    st.rerun()  # full rerun: re‑enables the button and stops the polling
+
+send_status()
+if "send_result" in st.session_state:
+    exc = st.session_state.pop("send_result")
+    if exc is not None:
+        st.error(f"Failed to send: {exc}")
+    else:
+        st.success("Report sent!")
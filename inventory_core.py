@@ -0,0 +1,325 @@
+# inventory_core.py – config, template I/O and e‑mail for inventory_app.py
+"""
+Everything the Streamlit UI needs that does not draw widgets.
+
+Streamlit re‑executes ``inventory_app.py`` on every interaction, but imported
+modules stay in ``sys.modules`` – so the configuration below is resolved once
+per process and the ``functools.lru_cache``s on the e‑mail builders survive
+across reruns instead of being rebuilt with the script.
+"""
+
+from __future__ import annotations
+import atexit
+import contextlib
+import functools
+import io
+import json
+import os
+import smtplib
+import tempfile
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from email.message import EmailMessage
+from concurrent.futures import Future, ThreadPoolExecutor
+from html import escape
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, List
+
+import pandas as pd
+import streamlit as st
+
+try:  # orjson is optional – templates fall back to the stdlib json module
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = lambda obj: json.dumps(obj, indent=2).encode()
+
+# ─────────────────────────────────────────────────────────────
+# 0.  Configuration  ░ SMTP + producer profiles
+# ─────────────────────────────────────────────────────────────
+SECRETS = st.secrets.get("smtp", {})
+SMTP_HOST = SECRETS.get("host") or os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(SECRETS.get("port") or os.getenv("SMTP_PORT", 465))
+SMTP_USER = SECRETS.get("user") or os.getenv("SMTP_USER")
+SMTP_PASS = SECRETS.get("pass") or os.getenv("SMTP_PASS")
+# seconds per socket operation: the pooled connection can sit idle for hours, and a
+# silently dropped one must fail its NOOP quickly, not hang every queued send
+SMTP_TIMEOUT = 30
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    """One producer's settings; built once at import and never mutated."""
+    categories: Tuple[str, ...]
+    # `{date}` is filled in by the UI at render time, so a long‑running
+    # server never sends yesterday's date
+    default_subject: str = "Inventory Report"
+    default_recipient: str = ""
+    mainstays: Tuple[Dict[str, str], ...] = ()
+
+PRODUCERS: Dict[str, Profile] = {
+    "Why Not Pie": Profile(
+        categories=("Cafe", "Market", "Goodies", "Frozen"),
+        default_subject="WNP Inventory {date}",
+        mainstays=(
+            {"name": "PBJ Muffins", "tag": "Cafe"},
+            {"name": "Biscotti", "tag": "Cafe"},
+            {"name": "Biscotti", "tag": "Frozen"},
+            {"name": "Salami n Cheese Sando", "tag": "Market"},
+        ),
+    ),
+    "Arbor Teas": Profile(
+        categories=("Market", "Cafe", "Freezer"),
+        default_subject="Arbor Teas Inventory {date}",
+    ),
+}
+
+TEMPLATE_DIR = Path.cwd() / "templates"
+TEMPLATE_DIR.mkdir(exist_ok=True)
+
+# ─────────────────────────────────────────────────────────────
+# 1.  Helpers
+# ─────────────────────────────────────────────────────────────
+# the inventory maps plain (name, tag) tuples straight to their qty – nothing to encode or split
+Key = Tuple[str, str]
+
+@functools.lru_cache(maxsize=32)
+def slugify(s: str) -> str:
+    return "_".join(s.lower().split())
+
+@functools.lru_cache(maxsize=32)
+def template_path(profile: str) -> Path:
+    return TEMPLATE_DIR / f"{slugify(profile)}.json"
+
+def load_template(profile: str) -> List[Dict[str, str]]:
+    p = template_path(profile)
+    # the mtime is part of the cache key, so edits on disk are picked up on the next call;
+    # nanoseconds, because two saves within one float‑second tick must not share an entry
+    return _load_template_cached(profile, p.stat().st_mtime_ns if p.exists() else 0)
+
+@st.cache_data(show_spinner=False)
+def _load_template_cached(profile: str, mtime_ns: int) -> List[Dict[str, str]]:
+    p = template_path(profile)
+    if p.exists():
+        try:
+            data = _json_loads(p.read_bytes())
+            return [d for d in data if isinstance(d, dict) and d.get("name")]
+        except Exception as exc:
+            st.error(f"⚠️ Could not parse {p}: {exc}")
+    cfg = PRODUCERS.get(profile)
+    return list(cfg.mainstays) if cfg else []
+
+def _write_template(profile: str, items: List[Dict[str, str]]):
+    p = template_path(profile)
+    data = _json_dumps(items)
+    # an unchanged list is a no‑op: no write, and the mtime (our cache key) stays put
+    if p.exists() and p.read_bytes() == data:
+        return
+    # write beside the target and swap it in, so a crash never leaves half a file;
+    # the temp name is unique, so overlapping writers (two sessions, or another
+    # server process) never replace each other's half‑written file
+    fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=f".{p.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates 0600; keep the template's mode, or the usual 0644 for a new one
+        os.chmod(tmp, p.stat().st_mode & 0o777 if p.exists() else 0o644)
+        os.replace(tmp, p)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+def save_template(profile: str, items: List[Dict[str, str]]) -> bool:
+    """Save `items` as the profile's template; False (with an st.error) if the write failed."""
+    try:
+        _write_template(profile, items)
+    except Exception as exc:
+        st.error(f"Template save failed: {exc}")
+        return False
+    return True
+
+def inventory_frame(inventory: Dict[Key, int]) -> pd.DataFrame:
+    """Columnar (name, tag, qty) view of the inventory, ordered by item name."""
+    names, tags = zip(*inventory)
+    frame = pd.DataFrame({"name": names, "tag": tags, "qty": list(inventory.values())})
+    return frame.sort_values("name", key=lambda s: s.str.lower(), kind="stable", ignore_index=True)
+
+_nl2br = lambda s: escape(s, quote=False).replace("\n", "<br>") if s else ""
+
+# ─────────────────────────────────────────────────────────────
+# 2.  E‑mail
+# ─────────────────────────────────────────────────────────────
+PLAIN_CAT_ROW = "=== %s ===\nItem\tQuantity\n"
+PLAIN_ITEM_ROW = "%s\t%d\n"
+HTML_CAT_ROW = "<tr style='background:#f3f3f3;font-weight:bold;'><td colspan='2' style='padding:6px 12px'>%s</td></tr>"
+HTML_ITEM_ROW = "<tr><td style='padding:4px 12px'>%s</td><td align='right'>%d</td></tr>"
+TABLE_OPEN = "<table border='1' cellspacing='0' cellpadding='4' style='border-collapse:collapse;font-family:sans-serif;'>"
+TABLE_HEAD = "<tr><th style='padding:4px 12px'>Item</th><th>Qty</th></tr>"
+TABLE_CLOSE = "</table>"
+HTML_OPEN, HTML_CLOSE = "<html><body>", "</body></html>"
+
+def _close_smtp(smtp: smtplib.SMTP_SSL) -> None:
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+class ChunkingSMTP(smtplib.SMTP_SSL):
+    """SMTP_SSL that sends the body with BDAT (RFC 3030) when the server offers CHUNKING."""
+
+    def data(self, msg):
+        if not isinstance(msg, bytes) or not self.has_extn("chunking"):
+            return super().data(msg)
+        # one `BDAT <size> LAST` carries the whole message: no 354 round‑trip
+        # and no dot‑stuffing scan; sendmail() checks the reply for 250
+        self.send(b"BDAT %d LAST\r\n" % len(msg) + msg)
+        return self.getreply()
+
+# the client currently held by the cache; one exit hook closes whichever it is,
+# so reconnects neither pile up handlers nor keep dead connections alive
+_live_smtp: Optional[smtplib.SMTP_SSL] = None
+
+@st.cache_resource(show_spinner=False)
+def _smtp_client() -> smtplib.SMTP_SSL:
+    global _live_smtp
+    smtp = ChunkingSMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    try:
+        smtp.login(SMTP_USER, SMTP_PASS)
+    except BaseException:
+        smtp.close()  # nothing is cached on failure, so nothing else would close it
+        raise
+    _live_smtp = smtp
+    return smtp
+
+@atexit.register
+def _close_live_smtp() -> None:
+    if _live_smtp is not None:
+        _close_smtp(_live_smtp)
+
+# the cached connection is shared by every session; SMTP commands must not interleave
+_SMTP_LOCK = threading.Lock()
+
+def _get_smtp() -> smtplib.SMTP_SSL:
+    """Return the process‑wide logged‑in SMTP connection, reconnecting if it went stale."""
+    smtp = _smtp_client()
+    try:
+        if smtp.noop()[0] == 250:
+            return smtp
+    except (smtplib.SMTPException, OSError):
+        pass
+    smtp.close()
+    _smtp_client.clear()
+    return _smtp_client()
+
+@functools.lru_cache(maxsize=16)
+def _section_heads(categories: Tuple[str, ...]) -> Dict[str, Tuple[str, str]]:
+    """(plain, html) section headers pre‑rendered once per profile category list."""
+    return {cat: _section_head(cat) for cat in categories}
+
+_section_head = lambda cat: (PLAIN_CAT_ROW % cat, HTML_CAT_ROW % escape(cat))
+
+# the same item names come back on every snapshot, so memoise their escaped form
+_escape_name = functools.lru_cache(maxsize=4096)(escape)
+
+@functools.lru_cache(maxsize=64)
+def _build_tables(items: Tuple[Tuple[str, str, int], ...], categories: Tuple[str, ...]) -> Tuple[str, str]:
+    """Render the grouped (plain, html) tables for a sorted (name, tag, qty) snapshot."""
+    # `items` is sorted once by the caller, so every bucket fills up already in name order
+    grouped: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    for name, tag, qty in items:
+        grouped[tag].append((name, qty))
+    heads = _section_heads(categories)
+    order = [c for c in categories if c in grouped] + [c for c in grouped if c not in heads]
+
+    # one pass writes both renderings while each category's rows are at hand;
+    # item names are user input, so they are HTML‑escaped on the way in
+    plain, html = io.StringIO(), io.StringIO()
+    # bound once, so the row loop runs on fast locals instead of global/attribute lookups
+    put_plain, put_html, esc = plain.write, html.write, _escape_name
+    plain_row, html_row = PLAIN_ITEM_ROW, HTML_ITEM_ROW
+    put_html(TABLE_OPEN + TABLE_HEAD)
+    for cat in order:
+        head_plain, head_html = heads.get(cat) or _section_head(cat)
+        put_plain(head_plain)
+        put_html(head_html)
+        for name, qty in grouped[cat]:
+            put_plain(plain_row % (name, qty))
+            put_html(html_row % (esc(name), qty))
+        put_plain("\n")
+    put_html(TABLE_CLOSE)
+    return plain.getvalue().strip(), html.getvalue()
+
+@functools.lru_cache(maxsize=16)
+def _body_parts(before_txt: str, after_txt: str) -> Tuple[str, str, str, str]:
+    """(plain_pre, plain_post, html_pre, html_post) wrapped around the tables."""
+    before, after = before_txt.strip(), after_txt.strip()
+    return (
+        before + "\n\n" if before else "", "\n\n" + after if after else "",
+        HTML_OPEN + _nl2br(before), _nl2br(after) + HTML_CLOSE,
+    )
+
+def _build_message(*, recipient: str, inventory: Dict[Key, int], categories: List[str], subject: str, before_txt: str, after_txt: str, html: bool = True) -> Tuple[bytes, List[str]]:
+    items = tuple(sorted((name, tag, qty) for (name, tag), qty in inventory.items() if qty > 0))
+    if not items:
+        raise ValueError("Nothing to report: every quantity is 0")
+    # the tables are cached per snapshot, so a plain‑only send just skips attaching the html
+    table_plain, table_html = _build_tables(items, tuple(categories))
+
+    # one SMTP transaction for every recipient: the first is shown in To, the rest go in Bcc
+    recipients = [r.strip() for r in recipient.split(",") if r.strip()]
+    if not recipients:
+        raise ValueError("No recipient address given")
+    msg = EmailMessage()
+    msg["Subject"], msg["From"], msg["To"] = subject, SMTP_USER, recipients[0]
+    if len(recipients) > 1:
+        msg["Bcc"] = ", ".join(recipients[1:])
+    plain_pre, plain_post, html_pre, html_post = _body_parts(before_txt, after_txt)
+    # one join per body: the table is copied once, not once per `+`
+    msg.set_content("".join((plain_pre, table_plain, plain_post)))
+    if html:
+        msg.add_alternative("".join((html_pre, table_html, html_post)), subtype="html")
+    # flatten once, the way send_message would (Bcc stripped, CRLF line ends, raw
+    # UTF‑8 headers for non‑ASCII addresses); a retry then resends the same bytes
+    del msg["Bcc"]
+    policy = msg.policy.clone(linesep="\r\n", utf8=_international(recipients))
+    return msg.as_bytes(policy=policy), recipients
+
+def _international(recipients: List[str]) -> bool:
+    """True if any envelope address needs SMTPUTF8 (RFC 6531)."""
+    return not all(addr.isascii() for addr in (SMTP_USER or "", *recipients))
+
+def _send_once(data: bytes, recipients: List[str]) -> None:
+    smtp = _get_smtp()
+    mail_options: List[str] = []
+    if _international(recipients):
+        # what send_message does for non‑ASCII addresses; sendmail() needs it spelled out
+        if not smtp.has_extn("smtputf8"):
+            raise smtplib.SMTPNotSupportedError(
+                "A non‑ASCII e‑mail address was given, but the mail server does not support SMTPUTF8"
+            )
+        mail_options = ["SMTPUTF8", "BODY=8BITMIME"]
+    smtp.sendmail(SMTP_USER, recipients, data, mail_options)
+
+def _deliver(data: bytes, recipients: List[str]) -> None:
+    with _SMTP_LOCK:
+        try:
+            _send_once(data, recipients)
+        except smtplib.SMTPServerDisconnected:
+            # the server hung up between the health check and the send – retry once
+            _smtp_client.clear()
+            _send_once(data, recipients)
+
+@st.cache_resource(show_spinner=False)
+def _send_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="send_email")
+
+def send_email_async(**kwargs: Any) -> Future:
+    """Build the message now and hand the SMTP round‑trip to a background thread.
+
+    The message is rendered on the calling thread, so later edits to the live
+    inventory cannot race the send; bad input raises here rather than in the future.
+    """
+    return _send_pool().submit(_deliver, *_build_message(**kwargs))